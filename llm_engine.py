@@ -1,39 +1,134 @@
 import asyncio
+import hashlib
 import os
 import platform
-import wave
+import shutil
+import struct
+import tempfile
+import threading
 import numpy as np
+import onnxruntime as ort
 from kokoro_onnx import Kokoro
 from ollama import AsyncClient
-from typing import List
+from typing import Deque, Tuple
 import traceback
+from collections import OrderedDict, deque
+from itertools import count, islice
 from concurrent.futures import ThreadPoolExecutor
 
+try:
+    import sounddevice as sd
+except ImportError:
+    sd = None
+
+try:
+    from numba import njit
+except ImportError:
+    # Without Numba the split scan below just runs as plain Python
+    def njit(*args, **kwargs):
+        return lambda fn: fn
+
 # --- CONFIGURATION ---
 OLLAMA_HOST = "http://localhost:11434"
 OLLAMA_MODEL = "qwen2.5:0.5b"
 LLM_CTX_SIZE = 1024
+# Keep the model (and its KV cache) resident between turns
+LLM_KEEP_ALIVE = "1h"
+
+SYSTEM_INSTRUCTION = (
+    "You are G-Maa, a loving grandmother. Use very short, kind sentences. "
+    "You are talking to a child."
+)
+# Rough token count of the system prompt (~3 chars/token, errs high) so
+# Ollama keeps it when the context window shifts
+LLM_NUM_KEEP = len(SYSTEM_INSTRUCTION) // 3 + 8
 
 TTS_MODEL_PATH = "models/kokoro-v0_19.onnx"
 TTS_VOICE_PATH = "models/voices.bin"
 TTS_VOICE_ID = "af_heart"
 TTS_SPEED = 1.1
+# Pre-generate the next chunk while one plays, but don't let parallel
+# ONNX inference thrash the caches (single-core boards run strictly serial)
+TTS_MAX_CONCURRENT = 2 if (os.cpu_count() or 1) > 1 else 1
+# Short phrases (fillers, the error fallback) are served from an LRU of PCM
+TTS_CACHE_SIZE = 64
+TTS_CACHE_MAX_CHARS = 80
+
+# In-process PortAudio output (sounddevice). Kokoro speaks at 24 kHz.
+OUTPUT_SAMPLE_RATE = 24000
+OUTPUT_BLOCK_FRAMES = 2048
+# Upper bound on waiting for aplay to play out its buffer after stdin EOF
+PLAYER_DRAIN_TIMEOUT = 2.0
 
 MAX_WORDS = 18
 SILENCE_TIMEOUT_MS = 800
 MIN_WORDS = 2
 
+def _wav_header(sr: int, n: int) -> bytes:
+    """44-byte header for n bytes of mono 16-bit PCM."""
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + n, b'WAVE', b'fmt ', 16,
+                       1, 1, sr, sr * 2, 2, 16, b'data', n)
+
+def _write_wav(fname: str, pcm: bytes, sr: int):
+    # Header + samples in one call; the buffered file object retries short writes
+    fd = os.open(fname, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(_wav_header(sr, len(pcm)) + pcm)
+
+# Word sets (lowercase) used by the phrase buffer
+TRAILING_CONJUNCTIONS = frozenset({"and", "but", "or", "so", "because"})
+SPLIT_CONJUNCTIONS = frozenset({"and", "but", "or"})
+SPLIT_PREPOSITIONS = frozenset({"in", "at", "to", "from", "of", "on"})
+
+# Word tags for the split-point scan
+TAG_NORMAL = 0
+TAG_COMMA = 1    # ends with a comma -> split after it
+TAG_CONJ = 2     # conjunction -> split before it
+TAG_PREP = 3     # preposition -> split before it if a capitalized word follows
+
+@njit(cache=True)
+def _find_split(tags, caps):
+    for i in range(len(tags) - 1, 0, -1):
+        if tags[i] == TAG_COMMA: return i + 1
+        if tags[i] == TAG_CONJ: return i
+        if tags[i] == TAG_PREP and i + 1 < len(tags) and caps[i + 1]: return i
+    return 0
+
+def _tag_word(word: str, lower: str) -> int:
+    if word[-1] == ",": return TAG_COMMA
+    if lower in SPLIT_CONJUNCTIONS: return TAG_CONJ
+    if lower in SPLIT_PREPOSITIONS: return TAG_PREP
+    return TAG_NORMAL
+
 class SmartPhraseBuffer:
     """Intelligently buffers tokens to speak in linguistically meaningful units."""
     def __init__(self, dispatch_callback):
-        self.buffer = ""
         self.dispatch_callback = dispatch_callback
         self.last_token_time = 0
         self.silence_task = None
 
+        # Completed words, lowercased and tagged once as they arrive.
+        # `tail` is the trailing fragment that may still grow.
+        self.words: Deque[str] = deque()
+        self.lowers: Deque[str] = deque()
+        self.tags: Deque[int] = deque()
+        self.caps: Deque[bool] = deque()
+        self.tail = ""
+        self.tail_lower = ""
+        _find_split(np.zeros(1, dtype=np.int8), np.zeros(1, dtype=np.bool_))  # JIT warm-up
+
+    @property
+    def word_count(self) -> int:
+        return len(self.words) + (1 if self.tail else 0)
+
     def add_token(self, token: str):
-        self.buffer += token
+        self._add_words(token)
         self.last_token_time = asyncio.get_event_loop().time()
+
+        # Only tokens that can change the outcome trigger a dispatch check
+        if any(c in token for c in ".!?,") or self.word_count >= 8:
+            self._try_dispatch()
+
         if self.silence_task:
             self.silence_task.cancel()
         # Trigger faster (300ms instead of 800ms)
@@ -41,52 +136,87 @@ class SmartPhraseBuffer:
 
     async def _silence_watchdog(self):
         await asyncio.sleep(0.3) 
-        if self.buffer.strip():
+        if self.word_count:
             self._try_dispatch(force=True)
 
     def _try_dispatch(self, force=False):
-        text = self.buffer.strip()
-        if not text: return
-        words = text.split()
-        word_count = len(words)
+        word_count = self.word_count
+        if not word_count: return
 
         # Minimum threshold (Avoid single letter stutters)
         if not force and word_count < 2: return
         
         # Punctuation Check (Immediate Trigger)
         # Added Comma (,) to this list to speak in natural chunks
-        if text[-1] in ".!?,":
-            self._do_dispatch(text)
+        last_word = self.tail or self.words[-1]
+        if last_word[-1] in ".!?,":
+            self._do_dispatch(self._text())
             return
         
-        conjunctions = {"and", "but", "or", "so", "because"}
-        if not force and words[-1].lower() in conjunctions: return
+        last_lower = self.tail_lower if self.tail else self.lowers[-1]
+        if not force and last_lower in TRAILING_CONJUNCTIONS: return
 
         # Length Check (Forced Flush)
         # Reduced to 8 words for snappier response
         if word_count >= 8 or force:
-            split_point = self._find_safe_split_point(words)
+            # Whatever stays buffered after a split is treated as finished
+            self._commit_tail()
+            split_point = self._find_safe_split_point()
             if split_point > 0:
-                chunk = " ".join(words[:split_point])
-                remainder = " ".join(words[split_point:])
-                self._do_dispatch(chunk)
-                self.buffer = remainder + " "
+                chunk = " ".join(islice(self.words, split_point))
+                for column in (self.words, self.lowers, self.tags, self.caps):
+                    for _ in range(split_point):
+                        column.popleft()
+                self._emit(chunk)
             else:
-                self._do_dispatch(text)
+                self._do_dispatch(self._text())
 
-    def _find_safe_split_point(self, words: List[str]) -> int:
-        for i in range(len(words) - 1, 0, -1):
-            word = words[i]
-            if word[-1] == ",": return i + 1
-            if word.lower() in {"and", "but", "or"}: return i
-            if i + 1 < len(words) and words[i+1][0].isupper():
-                 if word.lower() in {"in", "at", "to", "from", "of", "on"}: return i
-        return 0
-
-    def _do_dispatch(self, text):
+    def _add_words(self, token: str):
+        text = self.tail + token
+        words = text.split()
+        self.tail = words.pop() if words and not text[-1].isspace() else ""
+        self.tail_lower = self.tail.lower()
+        for word in words:
+            self._push_word(word, word.lower())
+
+    def _push_word(self, word: str, lower: str):
+        self.words.append(word)
+        self.lowers.append(lower)
+        self.tags.append(_tag_word(word, lower))
+        self.caps.append(word[0].isupper())
+
+    def _commit_tail(self):
+        if self.tail:
+            self._push_word(self.tail, self.tail_lower)
+            self.tail = self.tail_lower = ""
+
+    def _text(self) -> str:
+        text = " ".join(self.words)
+        if self.tail:
+            text = f"{text} {self.tail}" if text else self.tail
+        return text
+
+    def _find_safe_split_point(self) -> int:
+        n = len(self.tags)
+        tags = np.fromiter(self.tags, dtype=np.int8, count=n)
+        caps = np.fromiter(self.caps, dtype=np.bool_, count=n)
+        return int(_find_split(tags, caps))
+
+    def _emit(self, text):
         # print(f"🔄 Buffer Dispatching: '{text}'") # Commented out for cleaner logs
         self.dispatch_callback(text)
-        self.buffer = ""
+        if self.silence_task:
+            self.silence_task.cancel()
+
+    def _do_dispatch(self, text):
+        self._emit(text)
+        self.reset()
+
+    def reset(self):
+        """Drops everything buffered without speaking it."""
+        for column in (self.words, self.lowers, self.tags, self.caps):
+            column.clear()
+        self.tail = self.tail_lower = ""
         if self.silence_task:
             self.silence_task.cancel()
 
@@ -96,34 +226,91 @@ class G_Maa_Engine:
         self.llm_client = AsyncClient(host=OLLAMA_HOST)
         
         # Concurrency Control
-        self.executor = ThreadPoolExecutor(max_workers=2) 
+        self.executor = ThreadPoolExecutor(max_workers=TTS_MAX_CONCURRENT) 
+        self.gen_sem = asyncio.Semaphore(TTS_MAX_CONCURRENT)
         self.mute_callback = mute_callback
         self.unmute_callback = unmute_callback
         
         self.player_cmd = "aplay"
         if platform.system() == "Darwin": self.player_cmd = "afplay"
 
+        # PCM Streaming: aplay reads raw PCM from stdin, so one long-lived
+        # process is fed directly. afplay can't, so macOS still goes via WAV.
+        self.stream_playback = self.player_cmd == "aplay"
+        self.temp_dir = None
+        self.temp_counter = count()
+        self.player_proc = None
+        self.player_rate = None
+        self.play_until = 0.0
+        self.pcm_buffers = threading.local()  # one int16 buffer per TTS thread
+        self.tts_cache = OrderedDict()
+
+        # Direct Output: with sounddevice installed, PCM goes straight into
+        # a PortAudio stream (no subprocess, no pipe). Writes block, so they
+        # run on their own thread; the epoch lets interrupt() cut them short.
+        self.audio_executor = ThreadPoolExecutor(max_workers=1)
+        self.output_stream = None
+        if sd is not None:
+            try:
+                self.output_stream = self._open_output(OUTPUT_SAMPLE_RATE)
+                print("✅ Audio Output: PortAudio")
+            except Exception as e:
+                print(f"⚠️ PortAudio Output Failed ({e}). Using {self.player_cmd}.")
+
         try:
-            self.kokoro = Kokoro(TTS_MODEL_PATH, TTS_VOICE_PATH)
+            self.kokoro = self._load_kokoro()
             self.generate_method = self.kokoro.create
             print("✅ TTS Kokoro Initialized")
         except Exception as e:
             print(f"❌ TTS Init Failed: {e}")
             self.kokoro = None
 
-        # RESTORE: Queue for ordered execution
-        self.audio_queue = asyncio.Queue()
+        # RESTORE: Queue for ordered execution.
+        # Entries are (epoch, task); interrupt() bumps the epoch, so anything
+        # generated for an older epoch is never played, even if it was
+        # already off the queue.
+        self.epoch = 0
+        self.audio_queue: Deque[Tuple[int, asyncio.Task]] = deque()
+        self.queue_event = asyncio.Event()  # set whenever the queue gets an entry
+        self.current_task = None
         self.stop_event = asyncio.Event()
         self.playback_task = None
+        self.is_speaking = False
         self.phrase_buffer = SmartPhraseBuffer(self._queue_tts_generation)
         self.history = [] 
         self.rag_context = ""
 
+    def _load_kokoro(self):
+        """Kokoro on a tuned ONNX Runtime session (full graph fusion, all but one core)."""
+        if not hasattr(Kokoro, "from_session"):
+            # Older kokoro-onnx builds its own session with defaults
+            return Kokoro(TTS_MODEL_PATH, TTS_VOICE_PATH)
+
+        sess_opts = ort.SessionOptions()
+        sess_opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        sess_opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # Leave a core free for the event loop and the microphone thread
+        sess_opts.intra_op_num_threads = max(1, (os.cpu_count() or 1) - 1)
+        sess_opts.inter_op_num_threads = 1
+        session = ort.InferenceSession(TTS_MODEL_PATH, sess_opts, providers=['CPUExecutionProvider'])
+        return Kokoro.from_session(session, TTS_VOICE_PATH)
+
     async def start(self):
         self.stop_event.clear()
+        await self._warm_up_llm()
         # We wrap the worker in a safety loop to auto-restart if it crashes
         self.playback_task = asyncio.create_task(self._playback_supervisor())
 
+    async def _warm_up_llm(self):
+        """Loads the model with the same num_ctx as chat() so the first turn doesn't pay for it."""
+        try:
+            await self.llm_client.generate(
+                model=OLLAMA_MODEL, prompt='', keep_alive=LLM_KEEP_ALIVE,
+                options={'num_ctx': LLM_CTX_SIZE}
+            )
+        except Exception as e:
+            print(f"⚠️ LLM Warm-up Failed: {e}")
+
     async def _playback_supervisor(self):
         """Supervisor loop to keep playback running even if it crashes."""
         while not self.stop_event.is_set():
@@ -140,21 +327,35 @@ class G_Maa_Engine:
         self.stop_event.set()
         await self.interrupt()
         if self.playback_task:
-            self.playback_task.cancel()
+            # Wake the worker so it sees stop_event and exits; cancel if it won't
+            self.queue_event.set()
+            try:
+                await asyncio.wait_for(self.playback_task, timeout=2)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+        if self.output_stream:
+            self.output_stream.close()
+            self.output_stream = None
+        if self.temp_dir:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+            self.temp_dir = None
 
     async def interrupt(self):
-        # Clear pending tasks from queue
-        while not self.audio_queue.empty():
-            try:
-                task = self.audio_queue.get_nowait()
-                if not task.done():
-                    task.cancel()
-            except asyncio.QueueEmpty:
-                break
+        # Invalidate everything queued or in flight, then drop it
+        self.epoch += 1
+        for _, task in self.audio_queue:
+            task.cancel()
+        self.audio_queue.clear()
+        if self.current_task:
+            self.current_task.cancel()
         
         # Reset Buffer
-        self.phrase_buffer.buffer = ""
-        self.phrase_buffer._do_dispatch("") 
+        self.phrase_buffer.reset()
+
+        # Stop streaming playback, flushing whatever aplay still has buffered
+        self._close_player()
+        if self.output_stream:
+            await asyncio.get_event_loop().run_in_executor(self.audio_executor, self._flush_output)
         
         # Unmute mic
         if self.mute_callback:
@@ -173,51 +374,40 @@ class G_Maa_Engine:
         
         while not self.stop_event.is_set():
             
-            # 1. If Queue is completely empty -> Unmute (Safe to listen)
-            if self.audio_queue.empty():
-                if self.is_speaking:
-                    if self.unmute_callback:
-                        self.unmute_callback()
-                    self.is_speaking = False
-                await asyncio.sleep(0.1)
-                continue
-
-            # 2. Get next task in order
-            task = self.audio_queue.get_nowait()
-
-            # --- STRATEGIC UNMUTE ---
-            # We have a task to process, but we haven't generated or played it yet.
-            # If generation is slow, we should LISTEN for interrupts.
-            if self.is_speaking:
-                if self.unmute_callback:
-                    self.unmute_callback()
-                self.is_speaking = False
+            # 1 & 2. Block until the next task in order (unmutes if drained)
+            entry = await self._next_task()
+            if entry is None:
+                # stop() was called
+                break
+            epoch, task = entry
+            self.current_task = task
 
             # 3. Wait for generation (Concurrent generation happens here)
-            # If this takes 0.5s, the mic is ON for those 0.5s.
+            # If this takes 0.5s, the mic is ON for whatever part of it
+            # isn't covered by audio still playing.
             try:
-                temp_path = await task
+                result = await self._await_generation(task)
             except asyncio.CancelledError:
                 # Task was cancelled by engine.interrupt()
                 continue
             except Exception as e:
                 print(f"Task Error: {e}")
                 continue
+            finally:
+                self.current_task = None
 
-            if not temp_path:
-                # Task returned None (empty text) -> Keep listening
+            if epoch != self.epoch:
+                # Generated before an interrupt -> drop it
                 continue
 
-            if not os.path.exists(temp_path):
-                print(f"⚠️ File not found: {temp_path}")
+            if not result:
+                # Task returned None (empty text) -> Keep listening
                 continue
+
+            pcm, sr = result
             
             # 4. PLAYBACK PHASE -> MUTE MIC
-            try:
-                size = os.path.getsize(temp_path)
-                if size < 100:
-                    continue
-            except:
+            if len(pcm) < 100:
                 continue
 
             # Mute immediately before playing to avoid echo
@@ -227,38 +417,187 @@ class G_Maa_Engine:
                 self.is_speaking = True
 
             try:
-                proc = await asyncio.create_subprocess_exec(
-                    self.player_cmd, temp_path,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                
-                stdout, stderr = await proc.communicate()
-
-                # Cleanup
-                if os.path.exists(temp_path):
-                    try:
-                        os.remove(temp_path)
-                    except: pass
+                if self.output_stream:
+                    await self._write_output(pcm, sr)
+                elif self.stream_playback:
+                    await self._stream_pcm(pcm, sr)
+                else:
+                    await self._play_wav_file(pcm, sr)
 
                 # Note: We do NOT unmute here.
                 # The loop will start over, see if the queue is empty.
                 # If empty -> Unmute. If more chunks -> Unmute (while waiting).
             
             except Exception as e:
-                print(f"Playback Error: {e}")
-                if os.path.exists(temp_path):
-                    try: os.remove(temp_path) 
-                    except: pass
+                if epoch != self.epoch:
+                    # interrupt() killed the player mid-write (e.g. the
+                    # pipe reset under drain()) -> expected, not an error
+                    continue
+                print(f"Playback Error: {e!r}")
+                self._close_player()
                 self.is_speaking = False
 
+    async def _next_task(self):
+        """Awaits the next queued (epoch, task), or None once stopping.
+        If the queue has drained, unmutes the mic as soon as the audio
+        handed to the player has played out."""
+        if self.is_speaking and not self.audio_queue:
+            remaining = self.play_until - asyncio.get_event_loop().time()
+            if remaining > 0:
+                self.queue_event.clear()
+                try:
+                    await asyncio.wait_for(self.queue_event.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+            if not self.audio_queue:
+                # aplay holds back a partial period until EOF, so let it
+                # play out the tail before the mic comes back on
+                await self._finish_player()
+                # Queue is completely empty -> Unmute (Safe to listen)
+                if self.unmute_callback:
+                    self.unmute_callback()
+                self.is_speaking = False
+
+        while not self.audio_queue and not self.stop_event.is_set():
+            self.queue_event.clear()
+            await self.queue_event.wait()
+        if self.stop_event.is_set():
+            return None
+        return self.audio_queue.popleft()
+
+    async def _await_generation(self, task):
+        """Waits for a TTS task, unmuting if it outlasts the audio already queued."""
+        # --- STRATEGIC UNMUTE ---
+        # We have a task to process, but we haven't generated or played it yet.
+        # If generation is slow, we should LISTEN for interrupts.
+        if self.is_speaking and not task.done():
+            remaining = self.play_until - asyncio.get_event_loop().time()
+            if remaining > 0:
+                await asyncio.wait({task}, timeout=remaining)
+            if not task.done():
+                if self.unmute_callback:
+                    self.unmute_callback()
+                self.is_speaking = False
+        return await task
+
+    def _open_output(self, sr: int):
+        stream = sd.RawOutputStream(samplerate=sr, channels=1, dtype='int16',
+                                    blocksize=OUTPUT_BLOCK_FRAMES)
+        stream.start()
+        return stream
+
+    async def _write_output(self, pcm: bytes, sr: int):
+        """Plays PCM through the PortAudio stream on the audio thread."""
+        loop = asyncio.get_event_loop()
+        epoch = self.epoch
+        start = loop.time()
+        await loop.run_in_executor(self.audio_executor, self._blocking_output_write, pcm, sr, epoch)
+        if epoch == self.epoch:
+            # write() returns once PortAudio has the samples; the device
+            # buffer may still be playing the last block.
+            self.play_until = max(start, self.play_until) + len(pcm) / (2 * sr)
+
+    def _blocking_output_write(self, pcm: bytes, sr: int, epoch: int):
+        """Runs on the audio thread. Writes in small blocks so an interrupt lands fast."""
+        if self.output_stream.samplerate != sr:
+            self.output_stream.close()
+            self.output_stream = self._open_output(sr)
+        step = OUTPUT_BLOCK_FRAMES * 2
+        for i in range(0, len(pcm), step):
+            if epoch != self.epoch:
+                return
+            self.output_stream.write(pcm[i:i + step])
+
+    def _flush_output(self):
+        """Runs on the audio thread after any in-flight write has bailed out."""
+        self.output_stream.abort()
+        self.output_stream.start()
+
+    async def _stream_pcm(self, pcm: bytes, sr: int):
+        """Feeds raw PCM to the long-lived aplay process."""
+        proc = await self._ensure_player(sr)
+        proc.stdin.write(pcm)
+        await proc.stdin.drain()
+
+        # drain() returns once the pipe accepts the data, not when it's heard.
+        # Track when the audio ends so the mic stays muted until then.
+        now = asyncio.get_event_loop().time()
+        self.play_until = max(now, self.play_until) + len(pcm) / (2 * sr)
+
+    async def _play_wav_file(self, pcm: bytes, sr: int):
+        """Fallback for players that can't read PCM from stdin (afplay)."""
+        if self.temp_dir is None:
+            self.temp_dir = tempfile.mkdtemp(prefix="gmaa_")
+        fname = os.path.join(self.temp_dir, f"a_{next(self.temp_counter)}.wav")
+        try:
+            # Disk write stays off the event loop (audio thread is idle on this path)
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(self.audio_executor, _write_wav, fname, pcm, sr)
+
+            proc = await asyncio.create_subprocess_exec(
+                self.player_cmd, fname,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            await proc.communicate()
+        finally:
+            if os.path.exists(fname):
+                try: os.remove(fname)
+                except: pass
+
+    async def _ensure_player(self, sr: int):
+        """Returns the running aplay process, (re)spawning it if it died or the rate changed."""
+        proc = self.player_proc
+        if proc is None or proc.returncode is not None or self.player_rate != sr:
+            self._close_player()
+            proc = await asyncio.create_subprocess_exec(
+                self.player_cmd, "-q", "-f", "S16_LE", "-c", "1", "-r", str(sr),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            self.player_proc, self.player_rate = proc, sr
+        return proc
+
+    async def _finish_player(self):
+        """Closes aplay's stdin so it plays everything buffered, then waits for it to exit.
+        The next chunk spawns a fresh player."""
+        proc = self.player_proc
+        if proc is None:
+            return
+        if proc.stdin and not proc.stdin.is_closing():
+            proc.stdin.close()
+        try:
+            # Kept as player_proc meanwhile so interrupt() can still kill it
+            await asyncio.wait_for(proc.wait(), timeout=PLAYER_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        if self.player_proc is proc:
+            self._close_player()
+
+    def _close_player(self):
+        """Kills the player so audio still sitting in the pipe/ALSA buffer is dropped.
+        The next chunk spawns a fresh one."""
+        proc, self.player_proc = self.player_proc, None
+        self.play_until = 0.0
+        if proc is None:
+            return
+        if proc.stdin and not proc.stdin.is_closing():
+            proc.stdin.close()
+        if proc.returncode is None:
+            try:
+                proc.terminate()
+            except ProcessLookupError:
+                pass
+
     def _queue_tts_generation(self, text_chunk):
         # 1. Create the task (starts generating immediately in background)
         task = asyncio.create_task(self._generate_speech_file(text_chunk))
         
         # 2. Put the TASK in the queue immediately.
         # This guarantees the queue order is correct, even if B finishes generating before A.
-        self.audio_queue.put_nowait(task)
+        self.audio_queue.append((self.epoch, task))
+        self.queue_event.set()
 
     async def _generate_speech_file(self, text: str):
         if not self.kokoro: return None
@@ -268,53 +607,71 @@ class G_Maa_Engine:
         if len(text) < 2 or text in [".", ",", "!", "?", ":", ";", "-", "...", "\"", "'"]:
             return None
 
-        fname = os.path.abspath(f"temp_audio_{asyncio.get_event_loop().time()}.wav")
-        
+        cache_key = None
+        if len(text) <= TTS_CACHE_MAX_CHARS:
+            cache_key = hashlib.md5(f"{text.lower()}|{TTS_VOICE_ID}|{TTS_SPEED}".encode()).digest()
+            cached = self.tts_cache.get(cache_key)
+            if cached:
+                self.tts_cache.move_to_end(cache_key)
+                return cached
+
         try:
-            # Run the heavy TTS calculation in a background thread
+            # Run the heavy TTS calculation in a background thread.
+            # Semaphore waiters wake FIFO, so chunks still generate in order.
             loop = asyncio.get_event_loop()
-            audio, sr = await loop.run_in_executor(self.executor, self._blocking_tts_call, text)
+            async with self.gen_sem:
+                result = await loop.run_in_executor(self.executor, self._blocking_tts_call, text)
             
-            if audio is None or len(audio) == 0:
+            if result is None:
                 return None
 
-            audio_int16 = (audio * 32767).astype(np.int16)
-            
-            with wave.open(fname, 'wb') as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(2)
-                wf.setframerate(sr)
-                wf.writeframes(audio_int16.tobytes())
+            if cache_key:
+                self.tts_cache[cache_key] = result
+                if len(self.tts_cache) > TTS_CACHE_SIZE:
+                    self.tts_cache.popitem(last=False)
             
-            # FIX: RETURN the filename. Do NOT put it in the queue here.
-            return fname
+            # FIX: RETURN the audio. Do NOT put it in the queue here.
+            return result
             
         except Exception as e:
             print(f"❌ ERROR GENERATING AUDIO: {e}")
             return None
 
     def _blocking_tts_call(self, text: str):
-        """The blocking CPU-intensive part. Runs in separate thread."""
-        return self.generate_method(text, voice=TTS_VOICE_ID, speed=TTS_SPEED, lang='en-us')
+        """The blocking CPU-intensive part. Runs in separate thread.
+        Synthesizes and converts to int16 PCM in the same executor hop."""
+        audio, sr = self.generate_method(text, voice=TTS_VOICE_ID, speed=TTS_SPEED, lang='en-us')
+        if audio is None or len(audio) == 0:
+            return None
+
+        # Convert into a reused int16 buffer instead of allocating per chunk.
+        # Clip first (in place) so loud samples saturate instead of wrapping.
+        n = len(audio)
+        buf = getattr(self.pcm_buffers, "buf", None)
+        if buf is None or n > buf.size:
+            buf = self.pcm_buffers.buf = np.empty(max(n, 32768), dtype=np.int16)
+        np.clip(audio, -1.0, 1.0, out=audio)
+        np.multiply(audio, 32767.0, out=buf[:n], casting='unsafe')
+        return buf[:n].tobytes(), sr
 
     def set_rag_context(self, context: str):
         self.rag_context = context
 
     async def generate_and_speak(self, user_input: str):
-        system_instruction = (
-            "You are G-Maa, a loving grandmother. Use very short, kind sentences. "
-            "You are talking to a child."
-        )
-        
+        # Fixed system prompt + history form a stable prefix that Ollama can
+        # reuse from its KV cache. The RAG context changes per turn, so it
+        # rides inside the new user message (a second system message would be
+        # merged into the top system block by the chat template, changing the
+        # prefix). History keeps only the raw user_input.
+        messages = [{'role': 'system', 'content': SYSTEM_INSTRUCTION}]
+        messages.extend(self.history) 
+        user_content = user_input
         if self.rag_context:
-            system_instruction += (
-                f"\n\nUse the following syllabus content to answer if relevant: "
-                f"{self.rag_context}"
+            user_content = (
+                f"Use the following syllabus content to answer if relevant: "
+                f"{self.rag_context}\n\n{user_input}"
             )
-
-        messages = [{'role': 'system', 'content': system_instruction}]
-        messages.extend(self.history) 
-        messages.append({'role': 'user', 'content': user_input})
+        messages.append({'role': 'user', 'content': user_content})
 
         print(f"👤 User: {user_input}")
         print(f"👵 G-Maa: ...")
@@ -324,7 +681,8 @@ class G_Maa_Engine:
                 model=OLLAMA_MODEL,
                 messages=messages,
                 stream=True,
-                options={'num_ctx': LLM_CTX_SIZE, 'temperature': 0.7}
+                keep_alive=LLM_KEEP_ALIVE,
+                options={'num_ctx': LLM_CTX_SIZE, 'num_keep': LLM_NUM_KEEP, 'temperature': 0.7}
             )
 
             full_response = ""
@@ -332,7 +690,6 @@ class G_Maa_Engine:
                 token = chunk['message']['content']
                 full_response += token
                 self.phrase_buffer.add_token(token)
-                self.phrase_buffer._try_dispatch()
 
             self.phrase_buffer._try_dispatch(force=True)
             
@@ -345,4 +702,4 @@ class G_Maa_Engine:
 
         except Exception as e:
             print(f"LLM Error: {e}")
-            await self._queue_tts_generation("I'm having trouble thinking right now.")
\ No newline at end of file
+            self._queue_tts_generation("I'm having trouble thinking right now.")
\ No newline at end of file
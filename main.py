@@ -1,7 +1,5 @@
 import asyncio
 import sys
-import threading
-import queue
 
 from stt import VoskSTT
 from llm_engine import G_Maa_Engine
@@ -24,61 +22,73 @@ class ConversationOrchestrator:
             unmute_callback=lambda: self.stt.set_active(True)
         )
         
-        # Communication Queue
-        self.speech_queue = queue.Queue()
-        self.listening_thread = None
-        self.is_running = True
+        self.reply_task = None
 
-    def stt_worker(self):
-        """Runs in a separate thread to capture audio continuously."""
-        while self.is_running:
+    def _engine_busy(self):
+        """True while G-Maa is thinking or has speech playing/queued."""
+        thinking = self.reply_task is not None and not self.reply_task.done()
+        return thinking or self.engine.is_speaking or bool(self.engine.audio_queue)
+
+    async def _cancel_reply(self):
+        if self.reply_task and not self.reply_task.done():
+            self.reply_task.cancel()
             try:
-                # Increased silence_limit to 3000ms (3 seconds)
-                text = self.stt.listen(silence_limit=3000)
-                if text:
-                    print(f"➡️ STT Thread detected: '{text}'")
-                    self.speech_queue.put(text)
-            except Exception as e:
-                print(f"STT Error: {e}")
-                break
+                await self.reply_task
+            except asyncio.CancelledError:
+                pass
+        self.reply_task = None
 
     async def run_conversation_loop(self):
         """Main Async Loop handling Logic and TTS."""
         # Start the audio engine
         await self.engine.start()
         
-        # Start the listening thread
-        self.listening_thread = threading.Thread(target=self.stt_worker, daemon=True)
-        self.listening_thread.start()
-        
         print("\n🤖 G-Maa is ready! Speak to interrupt or start talking.\n")
 
-        loop = asyncio.get_event_loop()
+        barged_in = False
+        try:
+            # Streaming STT: partials arrive as words are recognized,
+            # the final once the user has been silent for 3 seconds
+            async for text, is_final in self.stt.stream(silence_limit=3000):
+                if not is_final:
+                    # Barge-in: stop talking at the first recognized word
+                    if not barged_in and self._engine_busy():
+                        barged_in = True
+                        await self._cancel_reply()
+                        await self.engine.interrupt()
+                    continue
 
-        while self.is_running:
-            try:
-                user_text = await loop.run_in_executor(None, self.speech_queue.get)
-            except KeyboardInterrupt:
-                break
+                barged_in = False
+                user_text = text
+                if not user_text:
+                    continue
+                print(f"➡️ STT detected: '{user_text}'")
 
-            if "stop" in user_text.lower() or "shut up" in user_text.lower():
-                await self.engine.interrupt()
-                continue
+                if "stop" in user_text.lower() or "shut up" in user_text.lower():
+                    await self._cancel_reply()
+                    await self.engine.interrupt()
+                    continue
 
-            # 1. Retrieve RAG Context
-            context = self.rag.retrieve_context(user_text)
-            self.engine.set_rag_context(context)
-            
-            # 2. Interrupt anything currently playing
-            await self.engine.interrupt()
-            
-            # 3. Generate Response and Speak
-            # This will trigger the mute_callback automatically
-            await self.engine.generate_and_speak(user_text)
+                # 1. Retrieve RAG Context
+                context = self.rag.retrieve_context(user_text)
+                self.engine.set_rag_context(context)
+                
+                # 2. Interrupt anything currently playing
+                await self._cancel_reply()
+                await self.engine.interrupt()
+                
+                # 3. Generate Response and Speak (in the background, so
+                # partials keep flowing and can barge in on it)
+                # This will trigger the mute_callback automatically
+                self.reply_task = asyncio.create_task(self.engine.generate_and_speak(user_text))
 
-        # Cleanup
-        self.is_running = False
-        await self.engine.stop()
+            # stream() only ends when the microphone fails or is closed
+            print("🎤 Microphone stream ended. Shutting down...")
+        finally:
+            # Cleanup
+            await self._cancel_reply()
+            await self.engine.stop()
+            self.stt.close()
 
 if __name__ == "__main__":
     orchestrator = ConversationOrchestrator()
@@ -1,26 +1,112 @@
 import os
+import platform
+from collections import OrderedDict
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from scipy.spatial.distance import cosine
+
+# The int8 ONNX path only needs the tokenizer and onnxruntime at runtime.
+# optimum (export) and sentence_transformers (fallback) pull in torch, so
+# they're imported only where they're used.
+try:
+    import onnxruntime as ort
+    from transformers import AutoTokenizer
+except ImportError:
+    ort = None
+
+EMBED_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+EMBED_ONNX_DIR = "models/minilm-l6-v2-int8"
+QUERY_CACHE_SIZE = 128
+EMBED_MAX_TOKENS = 256
+
+class OnnxMiniLM:
+    """
+    MiniLM sentence encoder running as a dynamic int8 ONNX model.
+    Exposes the subset of SentenceTransformer.encode() that RagEngine uses.
+    """
+    def __init__(self, model_dir=EMBED_ONNX_DIR):
+        model_path = os.path.join(model_dir, "model_quantized.onnx")
+        if not os.path.exists(model_path):
+            self.export(model_dir)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = ort.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    @staticmethod
+    def export(model_dir):
+        """One-time export of MiniLM to ONNX followed by int8 quantization."""
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        print(f"⚙️ Exporting {EMBED_MODEL_ID} to int8 ONNX (one-time)...")
+        model = ORTModelForFeatureExtraction.from_pretrained(EMBED_MODEL_ID, export=True)
+        model.save_pretrained(model_dir)
+        AutoTokenizer.from_pretrained(EMBED_MODEL_ID).save_pretrained(model_dir)
+
+        # ARM (Pi) gets NEON dot-product kernels, x86 gets AVX2/VNNI
+        if platform.machine().lower() in ("aarch64", "arm64"):
+            qconfig = AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+        else:
+            qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        quantizer = ORTQuantizer.from_pretrained(model_dir)
+        quantizer.quantize(save_dir=model_dir, quantization_config=qconfig)
+
+    def encode(self, sentences, batch_size=32, normalize_embeddings=False,
+               convert_to_numpy=True, show_progress_bar=False):
+        if isinstance(sentences, str):
+            return self.encode([sentences], batch_size, normalize_embeddings)[0]
+
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            # 256 matches SentenceTransformer's max_seq_length for this model
+            tokens = self.tokenizer(sentences[start:start + batch_size], padding=True,
+                                    truncation=True, max_length=EMBED_MAX_TOKENS,
+                                    return_tensors="np")
+            feed = {k: v for k, v in tokens.items() if k in self.input_names}
+            hidden = self.session.run(None, feed)[0]
+
+            # Mean pooling over real (non-padding) tokens
+            mask = tokens["attention_mask"].astype(np.float32)
+            pooled = np.einsum('bld,bl->bd', hidden, mask) / mask.sum(-1, keepdims=True)
+            batches.append(pooled.astype(np.float32))
+
+        embeddings = np.concatenate(batches) if batches else np.empty((0, 384), np.float32)
+        if normalize_embeddings:
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings
 
 class RagEngine:
     """
     Offline RAG engine using SentenceTransformers.
-    Optimized for Raspberry Pi (uses 'all-MiniLM-L6-v2').
+    Optimized for Raspberry Pi (uses 'all-MiniLM-L6-v2', int8 ONNX when available).
     """
     def __init__(self, data_path="data/syllabus.txt"):
         self.data_path = data_path
         print("📚 Loading RAG Model (MiniLM-L6-v2)...")
         # This model is small and fast enough for Pi 4
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.model = self._load_model()
+        # Pay the first-call lazy-init cost now, not inside the first user turn
+        self.model.encode(["warmup"], convert_to_numpy=True)
+        self.query_cache = OrderedDict()
         self.chunks = []
-        self.embeddings = []
+        self.embeddings = np.empty((0, 0), dtype=np.float32)
         
         if os.path.exists(data_path):
             self.load_and_index(data_path)
         else:
             print(f"⚠️ Syllabus file not found at {data_path}. RAG disabled.")
 
+    def _load_model(self):
+        """Prefers the quantized ONNX encoder, falling back to PyTorch."""
+        if ort is not None:
+            try:
+                model = OnnxMiniLM()
+                print("✅ RAG encoder: int8 ONNX")
+                return model
+            except Exception as e:
+                print(f"⚠️ ONNX encoder unavailable ({e}). Using PyTorch.")
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer('all-MiniLM-L6-v2')
+
     def load_and_index(self, path):
         """Reads text file and indexes it into chunks."""
         with open(path, 'r', encoding='utf-8') as f:
@@ -31,7 +117,12 @@ class RagEngine:
         self.chunks = [c.strip() for c in raw_chunks if len(c.strip()) > 50]
         
         print(f"🔢 Indexing {len(self.chunks)} text chunks...")
-        self.embeddings = self.model.encode(self.chunks, show_progress_bar=True)
+        # L2-normalized once here so retrieval is a plain dot product
+        embeddings = self.model.encode(self.chunks, convert_to_numpy=True,
+                                       normalize_embeddings=True,
+                                       batch_size=max(1, min(64, len(self.chunks))),
+                                       show_progress_bar=False)
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
         print("✅ Indexing complete.")
 
     def retrieve_context(self, query, top_k=2):
@@ -39,13 +130,30 @@ class RagEngine:
         if not self.chunks:
             return ""
             
-        query_embedding = self.model.encode(query)
+        query_embedding = self._encode_query(query)
         
-        # Calculate cosine similarity
-        similarities = [1 - cosine(query_embedding, emb) for emb in self.embeddings]
+        # Cosine similarity against every chunk in one matrix-vector product
+        similarities = self.embeddings @ query_embedding
         
-        # Get top indices
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        # Get top indices (partial sort, then order just the winners)
+        top_k = min(top_k, len(similarities))
+        top_indices = np.argpartition(-similarities, top_k - 1)[:top_k]
+        top_indices = top_indices[np.argsort(-similarities[top_indices])]
         
         context_parts = [self.chunks[i] for i in top_indices]
-        return "\n\n".join(context_parts)
\ No newline at end of file
+        return "\n\n".join(context_parts)
+
+    def _encode_query(self, query):
+        """Query embedding with a small LRU, since users often repeat themselves."""
+        key = query.strip()
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            self.query_cache.move_to_end(key)
+            return cached
+
+        embedding = self.model.encode([key], convert_to_numpy=True,
+                                      normalize_embeddings=True)[0].astype(np.float32)
+        self.query_cache[key] = embedding
+        if len(self.query_cache) > QUERY_CACHE_SIZE:
+            self.query_cache.popitem(last=False)
+        return embedding
\ No newline at end of file
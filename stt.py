@@ -1,9 +1,31 @@
+import asyncio
 import pyaudio
 import vosk
 import json
 import os
+import threading
 import numpy as np
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+if njit:
+    @njit(cache=True)
+    def mean_square(samples):
+        """Mean-square energy of int16 samples, accumulated without a temp copy."""
+        acc = 0
+        for s in samples:
+            acc += np.int64(s) * s
+        return acc / samples.size if samples.size else 0.0
+else:
+    def mean_square(samples):
+        # float32 so dot() is a single BLAS reduction; int16**2
+        # wraps and int32 sums overflow on loud 1024-sample frames
+        a = samples.astype(np.float32)
+        return a.dot(a) / a.size if a.size else 0.0
+
 class VoskSTT:
     """
     Modular Wrapper for Vosk Speech Recognition.
@@ -21,9 +43,26 @@ class VoskSTT:
         # Audio Configuration
         self.sample_rate = 16000
         self.chunk_size = 1024
+
+        # One decoder for the process lifetime; Reset() between utterances
+        self._rec = vosk.KaldiRecognizer(self.model, self.sample_rate)
         
         # Feedback Prevention Control
         self.active = True
+        # JIT warm-up. Uses frombuffer like the real call: Numba types the
+        # read-only view separately and would otherwise recompile mid-utterance.
+        mean_square(np.frombuffer(bytes(2 * self.chunk_size), dtype=np.int16))
+
+        # Keep the device open for the process lifetime; opening PortAudio
+        # per utterance costs tens to hundreds of ms on every turn.
+        self._lock = threading.Lock()
+        self._closed = False
+        self._pa = pyaudio.PyAudio()
+        self._stream = self._pa.open(format=pyaudio.paInt16,
+                                     channels=1,
+                                     rate=self.sample_rate,
+                                     input=True,
+                                     frames_per_buffer=self.chunk_size)
 
     def set_active(self, state):
         """Enable or disable the microphone input."""
@@ -31,32 +70,85 @@ class VoskSTT:
         # Optional: Print for debugging, remove if too noisy
         # print(f"🎤 Microphone: {'ON' if state else 'OFF (Muted)'}")
 
-    def listen(self, silence_limit=3000): # Default changed to 3000ms (3 seconds)
+    def close(self):
+        """Release the microphone stream and PortAudio."""
+        # Flag first so an in-progress listen() exits after its current read
+        self._closed = True
+        with self._lock:
+            if self._stream is None:
+                return
+            self._stream.stop_stream()
+            self._stream.close()
+            self._pa.terminate()
+            self._stream = None
+
+    def listen(self, silence_limit=3000, on_partial=None): # Default changed to 3000ms (3 seconds)
         """
         Listens to microphone until silence is detected.
         Returns the transcribed text string.
+        If given, on_partial(text) is called with the running transcript
+        whenever Vosk recognizes more of the utterance.
         """
-        p = pyaudio.PyAudio()
-        
-        # Setup Stream
-        stream = p.open(format=pyaudio.paInt16,
-                        channels=1,
-                        rate=self.sample_rate,
-                        input=True,
-                        frames_per_buffer=self.chunk_size)
-        
-        rec = vosk.KaldiRecognizer(self.model, self.sample_rate)
+        with self._lock:
+            return self._listen(silence_limit, on_partial)
+
+    async def stream(self, silence_limit=3000):
+        """
+        Listens continuously on a background thread.
+        Yields (text, is_final): partials as words are recognized (for
+        barge-in), then the full utterance (possibly empty) once
+        silence_limit passes.
+        """
+        loop = asyncio.get_running_loop()
+        results = asyncio.Queue()
+
+        def post(item):
+            try:
+                loop.call_soon_threadsafe(results.put_nowait, item)
+            except RuntimeError:
+                pass  # Event loop already closed (shutdown)
+
+        def worker():
+            try:
+                while not self._closed:
+                    text = self.listen(silence_limit, on_partial=lambda t: post((t, False)))
+                    # Posted even when empty so the consumer sees every utterance end
+                    post((text, True))
+            except Exception as e:
+                # Microphone failure: stop here rather than retrying a dead stream
+                print(f"STT Error: {e}")
+            finally:
+                # Ends the async iteration (and with it the conversation loop)
+                post(None)
+
+        threading.Thread(target=worker, daemon=True).start()
+        while True:
+            item = await results.get()
+            if item is None:
+                return
+            yield item
+
+    def _listen(self, silence_limit, on_partial=None):
+        stream = self._stream
+        if self._closed or stream is None:
+            raise RuntimeError("Microphone stream is closed")
+
+        rec = self._rec
+        rec.Reset()
         
         # We only print "Listening" if we are actually active
         if self.active:
             print("🎤 Listening...")
         
         text_buffer = ""
+        last_partial = ""
         silence_frames = 0
-        max_silence_frames = (self.sample_rate / self.chunk_size) * (silence_limit / 1000)
+        max_silence_frames = int((self.sample_rate / self.chunk_size) * (silence_limit / 1000))
+        # Compare mean-square energy against threshold² to skip the sqrt
+        silence_threshold_sq = 100 ** 2
         
         try:
-            while True:
+            while not self._closed:
                 data = stream.read(self.chunk_size, exception_on_overflow=False)
                 
                 # --- FEEDBACK PREVENTION ---
@@ -70,20 +162,21 @@ class VoskSTT:
                     if partial_text:
                         text_buffer += partial_text + " "
                         print(f"   👂 {partial_text}")
+                        if on_partial:
+                            on_partial(text_buffer.strip())
+                    last_partial = ""
                     silence_frames = 0
                 else:
+                    if on_partial:
+                        partial = json.loads(rec.PartialResult()).get("partial", "")
+                        if partial and partial != last_partial:
+                            last_partial = partial
+                            on_partial(text_buffer + partial)
+
                     # --- FIX: Stable VAD Math ---
-                    audio_chunk = np.frombuffer(data, dtype=np.int16)
-                    
-                    # Calculate mean only if buffer is not empty
-                    if len(audio_chunk) > 0:
-                        mean_sq = np.mean(audio_chunk**2)
-                        # Ensure no negative/NaN values before sqrt
-                        amplitude = np.sqrt(mean_sq if mean_sq > 0 else 0)
-                    else:
-                        amplitude = 0
+                    amplitude_sq = mean_square(np.frombuffer(data, dtype=np.int16))
                     
-                    if amplitude < 100: 
+                    if amplitude_sq < silence_threshold_sq: 
                         silence_frames += 1
                     else:
                         silence_frames = 0
@@ -92,13 +185,13 @@ class VoskSTT:
                     break
 
         except Exception as e:
+            # The device stays open across calls, so a failed read won't fix
+            # itself on the next listen(). Let the caller stop (or reopen).
             print(f"Microphone Error: {e}")
+            raise
         finally:
             final_result = json.loads(rec.FinalResult())
             final_text = final_result.get("text", "")
-            stream.stop_stream()
-            stream.close()
-            p.terminate()
         
         full_transcript = (text_buffer + final_text).strip()
         return full_transcript
\ No newline at end of file